@@ -41,6 +41,7 @@ setup(
     ],
     extras_require={
         'docs': [docs],
+        'uncrustify': ['cdifflib'],
         'development': [docs, vcs],
         'test': [
             docs,
@@ -53,7 +54,8 @@ setup(
             'pytest-pylint',
             'teamcity-messages',
             'pytest-cov',
-            'coverage'
+            'coverage',
+            'cdifflib'
         ]
     }
 )
@@ -92,7 +92,7 @@ class GitServer:
         self._repo.git.merge(cmd_option, name)
 
     def get_last_commit(self):
-        return self._repo.git.log('-n1', pretty='format:"%H"').replace('"', '')
+        return self._repo.git.rev_parse("HEAD")
 
     def exit(self):
         try:
@@ -121,11 +121,14 @@ def git_client(tmpdir, git_server):
         def line_dropped(self, line):
             print(line)
 
-    yield utils.Params(server=git_server,
-                       logger=Progress(),
-                       repo=repo,
-                       root_directory=workdir,
-                       repo_file=workdir.join(git_server.target_file))
+    try:
+        yield utils.Params(server=git_server,
+                           logger=Progress(),
+                           repo=repo,
+                           root_directory=workdir,
+                           repo_file=workdir.join(git_server.target_file))
+    finally:
+        repo.close()
 
 
 class GitEnvironment(utils.TestEnvironment):
@@ -140,6 +143,8 @@ class GitEnvironment(utils.TestEnvironment):
         self.repo = client.repo
         self.repo.git.checkout(self.server.target_branch)
         self.repo_file = client.repo_file
+        self._index_version = None
+        self._tracked_files = set()
 
         self.settings.Vcs.type = "git"
         self.settings.GitVcs.repo = client.server.url
@@ -151,16 +156,31 @@ class GitEnvironment(utils.TestEnvironment):
             pass
 
     def get_last_change(self):
-        changes = self.repo.git.log("origin/" + self.server.target_branch, pretty="oneline", max_count=1)
-        return changes.split(" ")[0]
+        return self.repo.git.rev_parse("origin/" + self.server.target_branch)
+
+    def _get_tracked_files(self):
+        # Git rewrites index via lock file, so any index change also changes its inode
+        index_stat = os.stat(os.path.join(self.repo.git_dir, "index"))
+        index_version = (index_stat.st_ino, index_stat.st_mtime_ns, index_stat.st_size)
+        if index_version != self._index_version:
+            # Output ends with a NUL character, so empty string after it is filtered out
+            self._tracked_files = set(filter(None, self.repo.git.ls_files("-z").split("\0")))
+            self._index_version = index_version
+        return self._tracked_files
 
     def file_present(self, file_path):
         relative_path = os.path.relpath(file_path, str(self.vcs_cooking_dir))
-        return relative_path in self.repo.git.ls_files(file_path)
+        tracked_files = self._get_tracked_files()
+        if relative_path in tracked_files:
+            return True
+        # Directory is present if any file inside it is tracked
+        return any(path.startswith(relative_path + "/") for path in tracked_files)
 
     def text_in_file(self, text, file_path):
         relative_path = os.path.relpath(file_path, str(self.vcs_cooking_dir))
-        return text in self.repo.git.show("HEAD:" + relative_path)
+        # Uses persistent 'git cat-file --batch' process instead of launching 'git show' each time
+        _, _, _, data = self.repo.git.get_object_data("HEAD:" + relative_path)
+        return text in data.decode("utf-8")
 
     def make_a_change(self):
         return self.server.make_a_change()
@@ -2,7 +2,9 @@ from typing import Union, List
 import pytest
 
 from universum import __main__
+from universum.lib.gravity import construct_component
 from universum.lib.module_arguments import IncorrectParameterError
+from universum.modules import vcs
 from . import utils
 
 
@@ -230,3 +232,15 @@ def test_swarm_changelist_incorrect_format():
     settings.Swarm.change = "123,456"
 
     assert_incorrect_parameter(settings, "changelist for unshelving is incorrect")
+
+
+@pytest.mark.parametrize("test_type, vcs_class, driver_names", [
+    ["main", vcs.MainVcs, ["LocalMainVcs", "PerforceMainVcs", "GitMainVcs", "GerritMainVcs", "GithubMainVcs"]],
+    ["submit", vcs.SubmitVcs, ["BaseSubmitVcs", "PerforceSubmitVcs", "GitSubmitVcs", "GerritSubmitVcs", "GitSubmitVcs"]],
+    ["poll", vcs.PollVcs, ["BasePollVcs", "PerforcePollVcs", "GitPollVcs", "GitPollVcs", "GitPollVcs"]]
+], ids=["main", "submit", "poll"])
+def test_vcs_driver_type(test_type, vcs_class, driver_names):
+    for vcs_type, driver_name in zip(["none", "p4", "git", "gerrit", "github"], driver_names):
+        settings = create_settings(test_type, vcs_type)
+        vcs_module = construct_component(vcs_class, settings)
+        assert type(vcs_module.driver).__name__ == driver_name
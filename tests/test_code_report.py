@@ -1,9 +1,12 @@
 import inspect
+import json
 import re
 from typing import List
 
 import pytest
 
+from universum.analyzers import uncrustify
+
 
 @pytest.fixture(name='runner_with_pylint')
 def fixture_runner_with_pylint(docker_main):
@@ -76,3 +79,31 @@ def test_pylint_analyzer_wrong_params(runner_with_pylint, args, expected_log):
     log = runner_with_pylint.run(get_config(args))
     assert re.findall(r'Run static pylint - [^\n]*Failed', log)
     assert expected_log in log
+
+
+def test_uncrustify_diff_cache(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("source_file.c").write("int main() {\n    return  0;\n}\n")
+    tmpdir.mkdir("uncrustify").join("source_file.c").write("int main() {\n    return 0;\n}\n")
+    tmpdir.join("cfg").write("code_width = 120\ninput_tab_size = 4\n")
+    settings = uncrustify.UncrustifyAnalyzer.define_arguments().parse_args(["--files", "source_file.c",
+                                                                            "--cfg-file", "cfg"])
+    settings.output_directory = str(tmpdir.join("uncrustify"))
+
+    blocks = uncrustify.UncrustifyAnalyzer(settings).get_blocks(["source_file.c"])
+    assert blocks["source_file.c"][0]["after"] == "int·main()·{↓\n····return·0;↓\n"
+    cache_file = tmpdir.join("uncrustify", ".diff_cache.json")
+    cache = json.loads(cache_file.read())
+    assert cache["version"] == uncrustify.DIFF_CACHE_VERSION
+
+    # Blocks cached in another format are discarded
+    stale_blocks = {key: [dict(block, after="outdated") for block in value] for key, value in cache["blocks"].items()}
+    cache_file.write(json.dumps({"version": uncrustify.DIFF_CACHE_VERSION - 1, "blocks": stale_blocks}))
+    assert uncrustify.UncrustifyAnalyzer(settings).get_blocks(["source_file.c"]) == blocks
+
+    # Second run takes blocks from '.diff_cache.json' instead of diffing the file again
+    def fail_to_diff(*args, **kwargs):
+        raise AssertionError("File was diffed despite cached blocks")
+
+    monkeypatch.setattr(uncrustify, "get_file_blocks", fail_to_diff)
+    assert uncrustify.UncrustifyAnalyzer(settings).get_blocks(["source_file.c"]) == blocks
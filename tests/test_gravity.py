@@ -42,6 +42,20 @@ def test_dependencies_simple(mock_module):
     assert get_dependencies(OnlyDep) == [OnlyDep]
 
 
+def test_dependencies_in_dict(mock_module):
+    class FirstDriver(mock_module):
+        pass
+
+    class SecondDriver(mock_module):
+        pass
+
+    class RootWithDict(mock_module):
+        drivers = {"first": Dependency(FirstDriver), "second": Dependency(SecondDriver)}
+        not_dependencies = {"key": "value"}
+
+    assert get_dependencies(RootWithDict) == [RootWithDict, FirstDriver, SecondDriver]
+
+
 def test_dependencies_two_users(mock_module):
     class Common(mock_module):
         pass
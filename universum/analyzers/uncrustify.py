@@ -1,11 +1,19 @@
 import argparse
+import concurrent.futures
 import difflib
+import functools
+import hashlib
+import json
+import subprocess
 import sys
 import os
 
 import re
-import sh
-from six.moves import zip
+
+try:
+    from cdifflib import CSequenceMatcher as SequenceMatcher
+except ImportError:
+    from difflib import SequenceMatcher
 
 from . import utils
 
@@ -13,22 +21,35 @@ from . import utils
 # If exceeded, summarized comment will be provided instead
 MAX_LINES = 11
 
+# Visible replacements for whitespace characters in diff messages
+INVISIBLE_SYMBOLS = str.maketrans({u" ": u"\u00b7", u"\t": u"\u2192\u2192\u2192\u2192", u"\n": u"\u2193\u000a"})
 
-def replace_invisible_symbols(line):
-    for old_str, new_str in zip([u" ", u"\t", u"\n"],
-                                [u"\u00b7", u"\u2192\u2192\u2192\u2192", u"\u2193\u000a"]):
-        return line.replace(old_str, new_str)
+# Cached blocks are ready texts of messages, so the version must be increased whenever their format changes
+DIFF_CACHE_VERSION = 1
 
 
 def add_files_recursively(item_path):
     files = []
-    item_path = os.path.join(os.getcwd(), item_path)
+    item_path = os.path.abspath(item_path)
     if os.path.isfile(item_path):
         files.append(item_path)
     elif os.path.isdir(item_path):
-        for root_dir, _, file_names in os.walk(item_path):
-            for file_name in file_names:
-                files.append(os.path.join(root_dir, file_name))
+        # DirEntry caches file type from directory listing, so no extra 'stat' calls are needed
+        directories = [item_path]
+        while directories:
+            subdirectories = []
+            # Unreadable directories are skipped, as 'os.walk' did
+            try:
+                with os.scandir(directories.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                        elif entry.is_file():
+                            files.append(entry.path)
+            except OSError:
+                continue
+            # Reversed, so that subdirectories are popped in the same order as 'os.walk' visits them
+            directories.extend(reversed(subdirectories))
     else:
         sys.stderr.write(item_path + " doesn't exist.")
         sys.exit(2)
@@ -54,8 +75,68 @@ def get_issue_json_format(src_file, diff):
     return issue
 
 
+def decode_lines(lines):
+    return [line.decode('utf-8', errors='replace') for line in lines]
+
+
+def split_lines(data):
+    """
+    Split file contents into lines, converting line endings to '\\n' as text mode reading used to do.
+
+    >>> split_lines(b"x;\\r\\ny;\\rz;\\n")
+    [b'x;\\n', b'y;\\n', b'z;\\n']
+    """
+    return data.replace(b"\r\n", b"\n").replace(b"\r", b"\n").splitlines(keepends=True)
+
+
 def get_text_for_block(start, end, lines):
-    return replace_invisible_symbols(''.join(lines[start: end]))
+    """
+    Join lines of the block, making whitespace characters visible.
+    Lines are compared as bytes, so only the text of mismatching blocks has to be decoded.
+
+    >>> get_text_for_block(0, 1, [b"\\tx \\n", b"y\\n"])
+    '→→→→x·↓\\n'
+    """
+    return b''.join(lines[start: end]).decode('utf-8', errors='replace').translate(INVISIBLE_SYMBOLS)
+
+
+def get_matching_blocks(src_lines, fixed_lines):
+    """
+    Get matching blocks of lines, skipping common prefix and suffix before running SequenceMatcher.
+    Trimming can pick different, and sometimes smaller, matches than SequenceMatcher run on whole files;
+    the last example matches 2 lines, while untrimmed SequenceMatcher matches 3.
+
+    >>> get_matching_blocks([b"a", b"b", b"c"], [b"a", b"b", b"x"])  # common prefix only
+    [Match(a=0, b=0, size=2), Match(a=3, b=3, size=0)]
+    >>> get_matching_blocks([b"x", b"b", b"c"], [b"y", b"b", b"c"])  # common suffix only
+    [Match(a=1, b=1, size=2), Match(a=3, b=3, size=0)]
+    >>> get_matching_blocks([b"a", b"c"], [b"a", b"b", b"c"])  # pure insertion
+    [Match(a=0, b=0, size=1), Match(a=1, b=2, size=1), Match(a=2, b=3, size=0)]
+    >>> get_matching_blocks([b"a", b"b"], [b"a", b"b"])  # nothing left in the middle
+    [Match(a=0, b=0, size=2), Match(a=2, b=2, size=0)]
+    >>> get_matching_blocks([b"c", b"c", b"b", b"a", b"c", b"b"], [b"c", b"b", b"c"])  # differs from SequenceMatcher
+    [Match(a=0, b=0, size=1), Match(a=1, b=2, size=1), Match(a=6, b=3, size=0)]
+    """
+    # Formatter usually changes small parts of the file, so only the differing middle is passed to SequenceMatcher
+    max_common = min(len(src_lines), len(fixed_lines))
+    prefix_size = 0
+    while prefix_size < max_common and src_lines[prefix_size] == fixed_lines[prefix_size]:
+        prefix_size += 1
+    suffix_size = 0
+    while suffix_size < max_common - prefix_size and src_lines[-suffix_size - 1] == fixed_lines[-suffix_size - 1]:
+        suffix_size += 1
+    src_end = len(src_lines) - suffix_size
+    fixed_end = len(fixed_lines) - suffix_size
+
+    matcher = SequenceMatcher(a=src_lines[prefix_size:src_end], b=fixed_lines[prefix_size:fixed_end], autojunk=False)
+    matching_blocks = [difflib.Match(0, 0, prefix_size)] if prefix_size else []
+    # cdifflib returns an iterator instead of a list; the last block is a dummy one of zero size
+    for match in list(matcher.get_matching_blocks())[:-1]:
+        matching_blocks.append(difflib.Match(match.a + prefix_size, match.b + prefix_size, match.size))
+    if suffix_size:
+        matching_blocks.append(difflib.Match(src_end, fixed_end, suffix_size))
+    matching_blocks.append(difflib.Match(len(src_lines), len(fixed_lines), 0))
+    return matching_blocks
 
 
 def get_mismatching_block(first_match, second_match, src_lines, fixed_lines):
@@ -71,6 +152,46 @@ def get_mismatching_block(first_match, second_match, src_lines, fixed_lines):
     return block
 
 
+def get_uncrustify_file_name(src_file, output_directory):
+    # Uncrustify copies absolute path in its target folder, that's why we use '+'
+    return os.path.normpath(output_directory + '/' + src_file)
+
+
+def get_html_file_name(file_name, output_directory):
+    file_name = os.path.relpath(file_name, output_directory).replace('/', '_') + '.html'
+    return os.path.join(output_directory, file_name)
+
+
+def generate_html_diff(file_name, left_lines, right_lines, output_directory, wrapcolumn, tabsize):
+    differ = difflib.HtmlDiff(tabsize=tabsize, wrapcolumn=wrapcolumn)
+    with open(get_html_file_name(file_name, output_directory), 'w') as outfile:
+        outfile.write(differ.make_file(decode_lines(left_lines), decode_lines(right_lines), context=False))
+
+
+def get_file_blocks(src_file, output_directory, wrapcolumn, tabsize):
+    # Module-level function, so that only file name and diff parameters are pickled for worker process
+    uncrustify_file = get_uncrustify_file_name(src_file, output_directory)
+    with open(src_file, 'rb') as src:
+        src_lines = split_lines(src.read())
+    with open(uncrustify_file, 'rb') as fixed:
+        fixed_lines = split_lines(fixed.read())
+
+    blocks = []
+    matching_blocks = get_matching_blocks(src_lines, fixed_lines)
+    previous_match = matching_blocks[0]
+    for match in matching_blocks[1:]:
+        block = get_mismatching_block(previous_match, match, src_lines, fixed_lines)
+        previous_match = match
+        if block:
+            blocks.append(block)
+
+    # Generate html diff
+    if blocks:
+        generate_html_diff(uncrustify_file, src_lines, fixed_lines, output_directory, wrapcolumn, tabsize)
+
+    return blocks
+
+
 class UncrustifyAnalyzer:
     """
     Uncrustify runner.
@@ -107,21 +228,24 @@ class UncrustifyAnalyzer:
         self.settings = settings
         self.wrapcolumn = None
         self.tabsize = None
+        if self.settings.cfg_file:
+            self.wrapcolumn, self.tabsize = self.read_htmldiff_parameters()
+        # Mismatching blocks of previous run, stored by hashes of source and fixed file
+        self.diff_cache_file = os.path.join(self.settings.output_directory, ".diff_cache.json")
+        self.diff_cache = self.read_diff_cache()
 
     def parse_files(self):
-        files = []
-        file_lines = []
+        # Dict keeps insertion order and drops files specified more than once
+        files = dict()
         for file_name in self.settings.file_names:
-            files.extend(add_files_recursively(file_name))
+            files.update(dict.fromkeys(add_files_recursively(file_name)))
         for file_list in self.settings.file_lists:
             with open(file_list) as f:
-                for file_name in f.readlines():
-                    file_lines.append(file_name.strip())
-        for file_name in file_lines:
-            files.extend(add_files_recursively(file_name))
-        for pattern in self.settings.pattern_form:
-            regexp = re.compile(pattern)
-            files = [file_name for file_name in files if regexp.match(file_name)]
+                for file_name in f:
+                    files.update(dict.fromkeys(add_files_recursively(file_name.strip())))
+        if self.settings.pattern_form:
+            regexps = [re.compile(pattern) for pattern in self.settings.pattern_form]
+            files = [file_name for file_name in files if all(regexp.match(file_name) for regexp in regexps)]
         files = [os.path.relpath(file_name) for file_name in files]
         if not files:
             sys.stderr.write("Please provide at least one file for analysis")
@@ -129,47 +253,70 @@ class UncrustifyAnalyzer:
 
         return files
 
-    def get_htmldiff_parameters(self):
-        if not (self.wrapcolumn and self.tabsize):
-            with open(self.settings.cfg_file) as config:
-                for line in config.readlines():
-                    if line.startswith("code_width"):
-                        self.wrapcolumn = int(line.split()[2])
-                    if line.startswith("input_tab_size"):
-                        self.tabsize = int(line.split()[2])
-        return self.wrapcolumn, self.tabsize
-
-    def generate_html_diff(self, file_name, left_lines, right_lines):
-        wrapcolumn, tabsize = self.get_htmldiff_parameters()
-        differ = difflib.HtmlDiff(tabsize=tabsize, wrapcolumn=wrapcolumn)
-        file_name = os.path.relpath(file_name, self.settings.output_directory).replace('/', '_') + '.html'
-        with open(os.path.join(self.settings.output_directory, file_name), 'w') as outfile:
-            outfile.write(differ.make_file(left_lines, right_lines, context=False))
-
-    def get_file_issues(self, src_file):
-        self.settings.output_directory = os.path.join(os.getcwd(), self.settings.output_directory)
-        # Uncrustify copies absolute path in its target folder, that's why we use '+'
-        uncrustify_file = os.path.normpath(self.settings.output_directory + '/' + src_file)
-
-        with open(src_file) as src:
-            src_lines = src.readlines()
-        with open(uncrustify_file) as fixed:
-            fixed_lines = fixed.readlines()
-
-        file_issues = []
-        matching_blocks = difflib.SequenceMatcher(a=src_lines, b=fixed_lines).get_matching_blocks()
-        previous_match = matching_blocks[0]
-        for match in matching_blocks[1:]:
-            block = get_mismatching_block(previous_match, match, src_lines, fixed_lines)
-            previous_match = match
-            if block:
-                file_issues.append(get_issue_json_format(src_file, block))
-
-        # Generate html diff
-        if file_issues:
-            self.generate_html_diff(uncrustify_file, src_lines, fixed_lines)
-
-        return file_issues
+    def read_htmldiff_parameters(self):
+        wrapcolumn = None
+        tabsize = None
+        with open(self.settings.cfg_file) as config:
+            for line in config:
+                if line.startswith("code_width"):
+                    wrapcolumn = int(line.split()[2])
+                elif line.startswith("input_tab_size"):
+                    tabsize = int(line.split()[2])
+                if wrapcolumn and tabsize:
+                    break
+        return wrapcolumn, tabsize
+
+    def read_diff_cache(self):
+        try:
+            with open(self.diff_cache_file) as cache:
+                data = json.load(cache)
+        except (OSError, ValueError):
+            return dict()
+        # Blocks stored in other format would produce outdated messages
+        if not isinstance(data, dict) or data.get("version") != DIFF_CACHE_VERSION:
+            return dict()
+        return data.get("blocks", dict())
+
+    def get_cache_key(self, src_file):
+        with open(src_file, 'rb') as src:
+            src_data = src.read()
+        with open(get_uncrustify_file_name(src_file, self.settings.output_directory), 'rb') as fixed:
+            fixed_data = fixed.read()
+        # Unchanged files are the most common case, no need to diff them
+        if src_data == fixed_data:
+            return None
+        return hashlib.blake2b(src_data).hexdigest() + hashlib.blake2b(fixed_data).hexdigest()
+
+    def get_blocks(self, files):
+        # Cache is looked up here, so only the files to diff are sent to worker processes
+        file_blocks = dict()
+        diff_cache = dict()
+        cache_misses = []
+        for file_name in files:
+            cache_key = self.get_cache_key(file_name)
+            if not cache_key:
+                file_blocks[file_name] = []
+                continue
+            blocks = self.diff_cache.get(cache_key)
+            html_file = get_html_file_name(get_uncrustify_file_name(file_name, self.settings.output_directory),
+                                           self.settings.output_directory)
+            if blocks is None or (blocks and not os.path.exists(html_file)):
+                cache_misses.append((file_name, cache_key))
+            else:
+                file_blocks[file_name] = diff_cache[cache_key] = blocks
+
+        worker = functools.partial(get_file_blocks, output_directory=self.settings.output_directory,
+                                   wrapcolumn=self.wrapcolumn, tabsize=self.tabsize)
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            diffs = executor.map(worker, [file_name for file_name, _ in cache_misses], chunksize=8)
+            for (file_name, cache_key), blocks in zip(cache_misses, diffs):
+                file_blocks[file_name] = diff_cache[cache_key] = blocks
+
+        # Only entries for currently checked files are kept, so the cache does not grow infinitely
+        self.diff_cache = diff_cache
+        with open(self.diff_cache_file, 'w') as cache:
+            json.dump({"version": DIFF_CACHE_VERSION, "blocks": diff_cache}, cache)
+        return file_blocks
 
     def execute(self):
         if not self.settings.cfg_file and ('UNCRUSTIFY_CONFIG' not in os.environ):
@@ -178,15 +325,21 @@ class UncrustifyAnalyzer:
             return 2
 
         files = self.parse_files()
-        try:
-            cmd = sh.Command("uncrustify")
-            cmd("-c", self.settings.cfg_file, "--prefix", self.settings.output_directory, files)
-        except sh.ErrorReturnCode as e:
-            sys.stderr.write(str(e) + '\n')
+        self.settings.output_directory = os.path.join(os.getcwd(), self.settings.output_directory)
+        cmd = ["uncrustify", "--prefix", self.settings.output_directory, "-F", "-"]
+        if self.settings.cfg_file:
+            cmd.extend(["-c", self.settings.cfg_file])
+        # File list is passed via stdin to not exceed command line length limit
+        file_list = ''.join(file_name + '\n' for file_name in files)
+        result = subprocess.run(cmd, input=file_list, universal_newlines=True,  # pylint: disable=subprocess-run-check
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode:
+            sys.stderr.write(result.stderr + '\n')
 
         issues_loads = []
+        file_blocks = self.get_blocks(files)
         for file_name in files:
-            issues_loads.extend(self.get_file_issues(file_name))
+            issues_loads.extend(get_issue_json_format(file_name, block) for block in file_blocks[file_name])
         if issues_loads:
             utils.analyzers_output(self.settings.result_file, issues_loads)
             return 1
@@ -1,3 +1,4 @@
+import json
 import sys
 
 from .modules.api_support import ApiSupport
@@ -42,7 +43,11 @@ class Api(Module):
 
     def execute(self):
         if self.settings.action == "file-diff":
-            print(self.api_support.get_file_diff())
+            file_diff = self.api_support.get_file_diff()
+            # No diff is stored if repository was not prepared (e.g. in 'nonci' mode), so output stays empty
+            if file_diff is not None:
+                json.dump(file_diff, sys.stdout, indent=4)
+            sys.stdout.write("\n")
         else:
             raise NotImplementedError()
 
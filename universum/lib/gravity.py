@@ -90,6 +90,9 @@ def get_dependencies(klass, result=None, parent=None):
     all_dependencies = [x for x in klass.__mro__ if issubclass(x, Module) and x != Module and x != klass]
     # dependencies
     all_dependencies.extend([x.klass for x in klass.__dict__.values() if isinstance(x, Dependency)])
+    # dependencies grouped in dicts, e.g. drivers chosen by settings
+    all_dependencies.extend([x.klass for value in klass.__dict__.values() if isinstance(value, dict)
+                             for x in value.values() if isinstance(x, Dependency)])
 
     for dependency in all_dependencies:
         parent[dependency] = klass
@@ -25,8 +25,8 @@ class ApiSupport(Module):
     def _set_entry(self, name, entry):
         self.data[name] = entry
 
-    def _get_entry(self, name):
-        return self.data.get(name, "")
+    def _get_entry(self, name, default=""):
+        return self.data.get(name, default)
 
     def get_environment_settings(self):
         pickle.dump(self.data, self.data_file)
@@ -37,4 +37,4 @@ class ApiSupport(Module):
         self._set_entry("DIFF", entry)
 
     def get_file_diff(self):
-        return self._get_entry("DIFF")
+        return self._get_entry("DIFF", None)
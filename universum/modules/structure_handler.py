@@ -51,7 +51,7 @@ class Block:
     True
     """
 
-    def __init__(self, name: str, parent: Optional[Block] = None):
+    def __init__(self, name: str, parent: Optional['Block'] = None):
         self.name: str = name
         self.status: str = "Success"
         self.children: List[Block] = []
@@ -67,7 +67,7 @@ class Block:
         return '{} - {}'.format(result, self.status) if not self.children else result
 
     @property  # getter
-    def parent(self) -> Optional[Block]:
+    def parent(self) -> Optional['Block']:
         return self._parent
 
     def is_successful(self) -> bool:
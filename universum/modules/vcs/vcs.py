@@ -1,17 +1,16 @@
 import inspect
-import json
+import os
 import shutil
-import sh
+import stat
 
-from typing import cast, Dict, List, Type, Union
+from typing import cast, Dict, List, Optional, Type, Union
 
 from . import git_vcs, github_vcs, gerrit_vcs, perforce_vcs, local_vcs, base_vcs
 from .. import artifact_collector
 from ..api_support import ApiSupport
 from ..project_directory import ProjectDirectory
 from ..structure_handler import needs_structure
-from ...lib import utils
-from ...lib.gravity import Dependency
+from ...lib.gravity import Dependency, construct_component
 from ...lib.module_arguments import IncorrectParameterError
 from ...lib.utils import make_block
 
@@ -22,43 +21,46 @@ __all__ = [
 ]
 
 
-def create_vcs(class_type: str = None) -> Type[ProjectDirectory]:
-    driver_factory_class: Union[
-        Dict[str, Type[base_vcs.BasePollVcs]],
-        Dict[str, Type[base_vcs.BaseSubmitVcs]],
-        Dict[str, Type[base_vcs.BaseDownloadVcs]]
-    ]
-    if class_type == "submit":
-        driver_factory_class = {
-            "none" : base_vcs.BaseSubmitVcs,
-            "p4" : perforce_vcs.PerforceSubmitVcs,
-            "git" : git_vcs.GitSubmitVcs,
-            "gerrit" : gerrit_vcs.GerritSubmitVcs,
-            "github" : git_vcs.GitSubmitVcs
-        }
-    elif class_type == "poll":
-        driver_factory_class = {
-            "none": base_vcs.BasePollVcs,
-            "p4": perforce_vcs.PerforcePollVcs,
-            "git": git_vcs.GitPollVcs,
-            "gerrit": git_vcs.GitPollVcs,
-            "github": git_vcs.GitPollVcs
-        }
-    else:
-        driver_factory_class = {
-            "none": local_vcs.LocalMainVcs,
-            "p4": perforce_vcs.PerforceMainVcs,
-            "git": git_vcs.GitMainVcs,
-            "gerrit": gerrit_vcs.GerritMainVcs,
-            "github": github_vcs.GithubMainVcs
-        }
+_DRIVER_FACTORIES: Dict[Optional[str], Union[
+    Dict[str, Type[base_vcs.BasePollVcs]],
+    Dict[str, Type[base_vcs.BaseSubmitVcs]],
+    Dict[str, Type[base_vcs.BaseDownloadVcs]]
+]] = {
+    "submit": {
+        "none": base_vcs.BaseSubmitVcs,
+        "p4": perforce_vcs.PerforceSubmitVcs,
+        "git": git_vcs.GitSubmitVcs,
+        "gerrit": gerrit_vcs.GerritSubmitVcs,
+        "github": git_vcs.GitSubmitVcs
+    },
+    "poll": {
+        "none": base_vcs.BasePollVcs,
+        "p4": perforce_vcs.PerforcePollVcs,
+        "git": git_vcs.GitPollVcs,
+        "gerrit": git_vcs.GitPollVcs,
+        "github": git_vcs.GitPollVcs
+    },
+    None: {
+        "none": local_vcs.LocalMainVcs,
+        "p4": perforce_vcs.PerforceMainVcs,
+        "git": git_vcs.GitMainVcs,
+        "gerrit": gerrit_vcs.GerritMainVcs,
+        "github": github_vcs.GithubMainVcs
+    }
+}
+
+_DRIVER_DEPENDENCIES: Dict[Optional[str], Dict[str, Dependency]] = {
+    class_type: {vcs_type: Dependency(cls) for vcs_type, cls in driver_factory_class.items()}
+    for class_type, driver_factory_class in _DRIVER_FACTORIES.items()
+}
+
 
+def create_vcs(class_type: str = None) -> Type[ProjectDirectory]:
     vcs_types: List[str] = ["none", "p4", "git", "gerrit", "github"]
 
     @needs_structure
     class Vcs(ProjectDirectory):
-        driver_factory: Dict[str, Dependency] = {vcs_type: Dependency(cls)
-                                                       for vcs_type, cls in driver_factory_class.items()}
+        driver_factory: Dict[str, Dependency] = _DRIVER_DEPENDENCIES[class_type]
 
         @staticmethod
         def define_arguments(argument_parser):
@@ -96,10 +98,11 @@ def create_vcs(class_type: str = None) -> Type[ProjectDirectory]:
                     required for CI builds with perforce.""").format(", ".join(vcs_types))
                 raise IncorrectParameterError(text)
 
-            try:
-                self.driver = driver_factory[self.settings.type]()
-            except AttributeError | KeyError:
-                raise NotImplementedError()
+            driver_factory = self.driver_factory.get(self.settings.type)
+            if driver_factory is None:
+                raise NotImplementedError(self.settings.type)
+            # Dependency descriptor is stored in dict, so construct the driver directly
+            self.driver = construct_component(driver_factory.klass, self.main_settings)
 
         @make_block("Finalizing")
         def finalize(self):
@@ -112,6 +115,28 @@ PollVcs: Type[ProjectDirectory] = create_vcs("poll")
 SubmitVcs: Type[ProjectDirectory] = create_vcs("submit")
 
 
+def _dump_tree(root: str, out_file) -> None:
+    # File list is only informational, so unreadable entries are mentioned in it instead of failing the build
+    try:
+        with os.scandir(root) as iterator:
+            # Hidden entries (including '.git') are skipped, as 'ls -lR' without '-a' did
+            entries = sorted((item for item in iterator if not item.name.startswith('.')), key=lambda item: item.name)
+    except OSError as error:
+        out_file.write(f"Cannot list directory {root}: {error.strerror}\n")
+        return
+
+    for entry in entries:
+        try:
+            entry_stat = entry.stat(follow_symlinks=False)
+        except OSError as error:
+            # E.g. the entry was removed after the directory was listed
+            out_file.write(f"Cannot access {entry.path}: {error.strerror}\n")
+            continue
+        out_file.write(f"{stat.filemode(entry_stat.st_mode)} {entry_stat.st_size:>10} {entry.path}\n")
+        if entry.is_dir(follow_symlinks=False):
+            _dump_tree(entry.path, out_file)
+
+
 class MainVcs(create_vcs()):  # type: ignore  # https://github.com/python/mypy/issues/2477
     artifacts_factory = Dependency(artifact_collector.ArtifactCollector)
     api_support_factory = Dependency(ApiSupport)
@@ -145,11 +170,12 @@ class MainVcs(create_vcs()):  # type: ignore  # https://github.com/python/mypy/i
         status_file.write(self.driver.get_repo_status())
 
         status_file.write("\nFile list:\n\n")
-        status_file.write(utils.trim_and_convert_to_unicode(sh.ls("-lR", self.settings.project_root)) + "\n")
+        _dump_tree(self.settings.project_root, status_file)
+        status_file.write("\n")
         status_file.close()
 
         file_diff = self.driver.calculate_file_diff()
-        self.api_support.add_file_diff(json.dumps(file_diff, indent=4))
+        self.api_support.add_file_diff(file_diff)
 
     def clean_sources_silently(self):
         try: